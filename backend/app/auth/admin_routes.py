@@ -1,10 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from ..db import get_session
-from ..models import User, Role
-from .proxy import require_role
+from threading import Lock
+from cachetools import TTLCache
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from ..db import get_async_session
+from ..models import User
+from ..schemas import UserRead, CreateUserRequest, SetRoleRequest
+from .proxy import require_admin, invalidate_user_cache
 
-router = APIRouter(prefix="/api/admin", tags=["Admin - User Management"])
+# Garde admin déclarée une fois pour toutes les routes du routeur
+router = APIRouter(
+    prefix="/api/admin",
+    tags=["Admin - User Management"],
+    dependencies=[Depends(require_admin)],
+)
+
+# Cache des pages de GET /users (dashboard admin qui poll), vidé à chaque mutation.
+# Les users créés au premier login (get_current_user) apparaissent au plus tard après le TTL.
+_users_page_cache: TTLCache = TTLCache(maxsize=256, ttl=20)
+_users_page_cache_lock = Lock()
+
+def _invalidate_users_pages() -> None:
+    with _users_page_cache_lock:
+        _users_page_cache.clear()
 
 @router.post(
     "/users",
@@ -46,65 +66,50 @@ router = APIRouter(prefix="/api/admin", tags=["Admin - User Management"])
             }
         },
         400: {
-            "description": "Invalid role or user already exists",
+            "description": "User already exists",
             "content": {
                 "application/json": {
-                    "examples": {
-                        "invalid_role": {
-                            "summary": "Invalid role",
-                            "value": {"detail": "Invalid role"}
-                        },
-                        "user_exists": {
-                            "summary": "User already exists",
-                            "value": {"detail": "User already exists"}
-                        }
-                    }
+                    "example": {"detail": "User already exists"}
                 }
             }
         },
         403: {
             "description": "Forbidden - Admin access required"
-        }
+        },
+        422: {"description": "Missing username or invalid role"}
     }
 )
-def create_user(
-    payload: dict,
-    session: Session = Depends(get_session),
-    _: User = Depends(require_role(Role.admin)),
+async def create_user(
+    payload: CreateUserRequest,
+    session: AsyncSession = Depends(get_async_session),
 ):
     """Create a new user (admin only)."""
-    username = payload.get("username")
-    role = payload.get("role", "viewer")
-    
-    if not username:
-        raise HTTPException(status_code=400, detail="Username is required")
-    
-    if role not in {r.value for r in Role}:
-        raise HTTPException(status_code=400, detail="Invalid role")
-    
-    # Vérifier si l'utilisateur existe déjà
-    existing = session.exec(select(User).where(User.username == username)).first()
-    if existing:
-        raise HTTPException(status_code=400, detail="User already exists")
-    
     # Créer un email basé sur le username
-    email = payload.get("email", f"{username}@local")
+    email = payload.email or f"{payload.username}@local"
     
-    user = User(email=email, username=username, role=Role(role))
+    # Unicité garantie par la base (username / email) : pas de SELECT préalable
+    user = User(email=email, username=payload.username, role=payload.role)
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    try:
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(status_code=400, detail="User already exists")
+    _invalidate_users_pages()
     return user
 
 @router.get(
     "/users",
+    response_model=list[UserRead],
     summary="List all users",
     description="""
     Retrieve a list of all users in the system.
     
     **Permissions:** Admin only
     
-    Returns all user information including ID, username, email, role and timestamps.
+    Returns user information including ID, username, email, role and creation date.
+    
+    **Pagination:** `limit` (default 50, max 500) and `offset` (default 0), newest users first.
     """,
     responses={
         200: {
@@ -133,12 +138,24 @@ def create_user(
         403: {"description": "Forbidden - Admin access required"}
     }
 )
-def list_users(
-    session: Session = Depends(get_session),
-    _: User = Depends(require_role(Role.admin)),
+async def list_users(
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    session: AsyncSession = Depends(get_async_session),
 ):
     """List all users (admin only)."""
-    return session.exec(select(User).order_by(User.id.desc())).all()
+    key = (limit, offset)
+    with _users_page_cache_lock:
+        cached = _users_page_cache.get(key)
+    if cached is not None:
+        return cached
+
+    # Projection de colonnes : pas d'instanciation ORM pour un endpoint en lecture seule
+    stmt = select(User.id, User.username, User.email, User.role, User.created_at).order_by(User.id.desc())
+    rows = (await session.exec(stmt.limit(limit).offset(offset))).all()
+    with _users_page_cache_lock:
+        _users_page_cache[key] = rows
+    return rows
 
 @router.put(
     "/users/{user_id}/role",
@@ -164,28 +181,26 @@ def list_users(
                 }
             }
         },
-        400: {"description": "Invalid role"},
         403: {"description": "Forbidden - Admin access required"},
-        404: {"description": "User not found"}
+        404: {"description": "User not found"},
+        422: {"description": "Invalid role"}
     }
 )
-def set_role(
+async def set_role(
     user_id: int,
-    payload: dict,
-    session: Session = Depends(get_session),
-    _: User = Depends(require_role(Role.admin)),
+    payload: SetRoleRequest,
+    session: AsyncSession = Depends(get_async_session),
 ):
     """Update user role (admin only)."""
-    role = payload.get("role")
-    if role not in {r.value for r in Role}:
-        raise HTTPException(status_code=400, detail="Invalid role")
-
-    u = session.get(User, user_id)
-    if not u:
+    # UPDATE ... RETURNING : un seul aller-retour, pas de chargement ORM préalable
+    new_role = payload.role
+    result = await session.execute(
+        update(User).where(User.id == user_id).values(role=new_role).returning(User.email)
+    )
+    email = result.scalar_one_or_none()
+    if email is None:
         raise HTTPException(status_code=404, detail="User not found")
-
-    u.role = Role(role)
-    session.add(u)
-    session.commit()
-    session.refresh(u)
-    return {"ok": True, "id": u.id, "role": u.role}
+    await session.commit()
+    invalidate_user_cache(email)
+    _invalidate_users_pages()
+    return {"ok": True, "id": user_id, "role": new_role}
@@ -1,8 +1,32 @@
+from functools import lru_cache
+from threading import Lock
+from cachetools import TTLCache
 from fastapi import Header, HTTPException, Depends
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 from ..db import get_session
 from ..models import User, Role
-from ..config import settings
+from ..config import get_settings
+
+settings = get_settings()
+
+# Email bootstrap normalisé une seule fois au chargement du module
+_BOOTSTRAP_ADMIN_EMAIL_LC = (settings.bootstrap_admin_email or "").lower() or None
+
+# Cache email -> colonnes du User, pour éviter un SELECT à chaque requête authentifiée.
+# TTL court : un changement de rôle fait dans un autre worker est visible au bout de 30 s max.
+_user_cache: TTLCache = TTLCache(maxsize=1024, ttl=30)
+_user_cache_lock = Lock()
+
+def _is_forced_admin(email: str) -> bool:
+    """Bootstrap admin OU mode DEV avec admin@test.com."""
+    return (_BOOTSTRAP_ADMIN_EMAIL_LC is not None and email.lower() == _BOOTSTRAP_ADMIN_EMAIL_LC) or \
+           (settings.env == "dev" and email == "admin@test.com")
+
+def invalidate_user_cache(email: str) -> None:
+    """À appeler après toute modification d'un User (rôle, suppression...)."""
+    with _user_cache_lock:
+        _user_cache.pop(email, None)
 
 def get_identity_from_headers(
     x_auth_request_email: str | None = Header(default=None, alias="X-Auth-Request-Email"),
@@ -40,35 +64,56 @@ def get_current_user(
     email = ident["email"]
     username = ident["username"]
 
+    with _user_cache_lock:
+        cached = _user_cache.get(email)
+    if cached is not None:
+        # Objet détaché reconstruit depuis le cache (lecture seule)
+        return User(**cached)
+
     user = session.exec(select(User).where(User.email == email)).first()
     if not user:
         # Rôle par défaut : viewer
-        role = Role.viewer
-        
-        # Bootstrap admin OU mode DEV avec admin@test.com
-        if (settings.bootstrap_admin_email and email.lower() == settings.bootstrap_admin_email.lower()) or \
-           (settings.env == "dev" and email == "admin@test.com"):
-            role = Role.admin
+        role = Role.admin if _is_forced_admin(email) else Role.viewer
 
         user = User(email=email, username=username, role=role)
         session.add(user)
-        session.commit()
+        try:
+            session.commit()
+        except IntegrityError:
+            # username déjà pris par un autre email (ou création concurrente du même user)
+            session.rollback()
+            user = session.exec(select(User).where(User.email == email)).first()
+            if not user:
+                user = User(email=email, username=email, role=role)
+                session.add(user)
+                session.commit()
         session.refresh(user)
     else:
         # Si c'est l'admin bootstrap OU admin de dev, on s'assure que le rôle reste admin
-        if (settings.bootstrap_admin_email and email.lower() == settings.bootstrap_admin_email.lower()) or \
-           (settings.env == "dev" and email == "admin@test.com"):
-            if user.role != Role.admin:
-                user.role = Role.admin
-                session.add(user)
-                session.commit()
-                session.refresh(user)
+        if _is_forced_admin(email) and user.role != Role.admin:
+            user.role = Role.admin
+            session.add(user)
+            session.commit()
+            session.refresh(user)
 
+    with _user_cache_lock:
+        _user_cache[email] = user.model_dump()
     return user
 
 def require_role(*roles: Role):
+    # Même ensemble de rôles (quel que soit l'ordre) => même callable, donc même
+    # clé pour le cache de dépendances FastAPI
+    return _role_guard(frozenset(roles))
+
+@lru_cache(maxsize=None)
+def _role_guard(roles: frozenset[Role]):
     def _guard(user: User = Depends(get_current_user)) -> User:
         if user.role not in roles:
             raise HTTPException(status_code=403, detail="Forbidden")
         return user
     return _guard
+
+# Guards instanciés une seule fois : chaque route réutilise le même callable
+require_admin = require_role(Role.admin)
+require_dev = require_role(Role.admin, Role.dev)
+require_viewer = require_role(*Role)
@@ -1,3 +1,4 @@
+from functools import lru_cache
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -8,4 +9,17 @@ class Settings(BaseSettings):
     # si l'email match, on force ADMIN (pratique pour démarrer)
     bootstrap_admin_email: str | None = None
 
-settings = Settings()
+    # runner des pipelines : réel (git/maven/docker/ssh) ou fake pour la démo
+    use_real_runner: bool = True
+
+    # registre Docker joignable par le CI et la machine de déploiement (ex: "100.68.111.86:5000") :
+    # seules les couches modifiées transitent. Vide = `docker save | ssh docker load` (image complète)
+    deploy_registry: str | None = None
+
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Settings parsés une seule fois par process (utilisable aussi via Depends)."""
+    return Settings()
+
+# compat : imports existants `from .config import settings`
+settings = get_settings()
@@ -1,11 +1,125 @@
-from sqlmodel import SQLModel, create_engine, Session
+from sqlalchemy import URL, event, inspect, make_url, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel, create_engine, Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from .config import settings
 
-engine = create_engine(settings.database_url, echo=False)
+_is_sqlite = settings.database_url.startswith("sqlite")
+
+def _is_memory_sqlite(url: str) -> bool:
+    """SQLite en mémoire (`sqlite://`, `:memory:`) : pool mono-connexion, sans réglage de taille."""
+    u = make_url(url)
+    return u.get_backend_name() == "sqlite" and (
+        u.database in (None, "", ":memory:") or u.query.get("mode") == "memory"
+    )
+
+# Pool dimensionné pour le threadpool FastAPI (5 connexions par défaut = blocage sous charge).
+# Ces réglages n'existent que pour un QueuePool : SingletonThreadPool/StaticPool les refusent.
+_pool_sizing = {} if _is_memory_sqlite(settings.database_url) else {
+    "pool_size": 20,
+    "max_overflow": 20,
+    "pool_timeout": 30,
+}
+
+engine = create_engine(
+    settings.database_url,
+    echo=False,
+    **_pool_sizing,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    # SQLite : les routes sync tournent dans des threads différents de celui qui a ouvert la connexion
+    connect_args={"check_same_thread": False} if _is_sqlite else {},
+)
+
+# Driver async par backend, quel que soit le driver sync de DATABASE_URL (sqlite+pysqlite, postgresql+psycopg2...)
+_ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+def _async_url(url: str) -> URL:
+    """Même base, driver async (aiosqlite / asyncpg)."""
+    u = make_url(url)
+    driver = _ASYNC_DRIVERS.get(u.get_backend_name())
+    return u.set(drivername=driver) if driver else u
+
+# Engine async pour les routes `async def` : pas de passage par le threadpool
+async_engine = create_async_engine(
+    _async_url(settings.database_url),
+    echo=False,
+    **_pool_sizing,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+)
+
+def _set_sqlite_pragmas(dbapi_connection, _connection_record) -> None:
+    """WAL : les lectures ne bloquent plus sur les écritures ; NORMAL : un seul fsync par commit."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA cache_size=-64000")  # 64 Mo
+    cursor.execute("PRAGMA mmap_size=268435456")  # 256 Mo
+    cursor.close()
+
+if _is_sqlite:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
 
 def init_db() -> None:
     SQLModel.metadata.create_all(engine)
+    _backfill_pipeline_slugs()
+    _ensure_unique_usernames()
+    # index ajouté après coup : create_all ne le crée pas sur une table run existante
+    with engine.begin() as conn:
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_run_pipeline_id ON run (pipeline_id)"))
 
-def get_session():
+def _backfill_pipeline_slugs() -> None:
+    """Migration one-shot : ajoute pipeline.slug aux bases existantes et le remplit."""
+    from .models import Pipeline, pipeline_slug
+
+    columns = {c["name"] for c in inspect(engine).get_columns("pipeline")}
+    with Session(engine) as session:
+        if "slug" not in columns:
+            session.exec(text("ALTER TABLE pipeline ADD COLUMN slug VARCHAR NOT NULL DEFAULT ''"))
+            session.exec(text("CREATE INDEX IF NOT EXISTS ix_pipeline_slug ON pipeline (slug)"))
+        for p in session.exec(select(Pipeline).where(Pipeline.slug == "")):
+            p.slug = pipeline_slug(p.name)
+            session.add(p)
+        session.commit()
+
+def _ensure_unique_usernames() -> None:
+    """Migration one-shot : ix_user_username devient UNIQUE sur les bases existantes.
+
+    Doublons déjà en base : le plus ancien garde son username, les suivants
+    prennent leur email (comme la création auto depuis oauth2-proxy en cas de conflit).
+    """
+    from .models import User
+
+    indexes = {i["name"]: i for i in inspect(engine).get_indexes("user")}
+    if indexes.get("ix_user_username", {}).get("unique"):
+        return
     with Session(engine) as session:
+        taken: set[str] = set()
+        renamed: list[User] = []
+        for u in session.exec(select(User).order_by(User.id)):
+            if u.username in taken:
+                renamed.append(u)
+            else:
+                taken.add(u.username)
+        for u in renamed:
+            username = u.email if u.email not in taken else f"{u.username}-{u.id}"
+            taken.add(username)
+            u.username = username
+            session.add(u)
+        session.flush()
+        if "ix_user_username" in indexes:
+            session.exec(text("DROP INDEX ix_user_username"))
+        session.exec(text('CREATE UNIQUE INDEX ix_user_username ON "user" (username)'))
+        session.commit()
+
+def get_session():
+    # Session limitée à la requête : inutile d'expirer les objets après commit
+    # (sinon chaque accès post-commit relance un SELECT)
+    with Session(engine, expire_on_commit=False) as session:
+        yield session
+
+async def get_async_session():
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
         yield session
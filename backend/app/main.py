@@ -1,3 +1,7 @@
+import asyncio
+import os
+import sys
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
@@ -5,6 +9,7 @@ from .db import init_db
 from .auth.routes import router as auth_router
 from .pipelines.routes import router as pipelines_router
 from .auth.admin_routes import router as admin_router
+from .pipelines.runner_real import reap_interrupted_runs
 
 app = FastAPI(title="CI/CD API")
 
@@ -28,6 +33,25 @@ app.add_middleware(
 @app.on_event("startup")
 def _startup():
     init_db()
+    reap_interrupted_runs()
+
+@app.on_event("startup")
+async def _install_child_watcher():
+    """Fin des sous-processus des runs via pidfd (Linux) plutôt qu'un thread waitpid par process.
+
+    Python >= 3.12 le fait déjà tout seul ; uvloop (uvicorn[standard]) gère ses
+    sous-processus lui-même et n'a pas de child watcher.
+    """
+    if sys.version_info >= (3, 12) or not hasattr(os, "pidfd_open"):
+        return
+    if type(asyncio.get_event_loop_policy()) is not asyncio.DefaultEventLoopPolicy:
+        return
+    watcher = asyncio.PidfdChildWatcher()
+    try:
+        asyncio.set_child_watcher(watcher)
+    except NotImplementedError:
+        return
+    watcher.attach_loop(asyncio.get_running_loop())
 
 @app.get(
     "/api/health",
@@ -1,3 +1,4 @@
+import re
 from datetime import datetime
 from enum import Enum
 from sqlmodel import SQLModel, Field
@@ -10,14 +11,28 @@ class Role(str, Enum):
 class User(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
     email: str = Field(index=True, unique=True)
-    username: str = Field(index=True)
+    username: str = Field(index=True, unique=True)
     role: Role = Field(default=Role.viewer)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+# Tout ce qui n'est pas valide dans un nom d'image/conteneur Docker (et les caractères
+# spéciaux du shell, le slug étant interpolé dans les commandes ssh)
+_SLUG_INVALID = re.compile(r"[^a-z0-9]+")
+
+def pipeline_slug(name: str) -> str:
+    """Nom de pipeline -> nom d'image/conteneur Docker valide.
+
+    Minuscules et chiffres séparés par un seul `-`, sans `-` en bord, 2 à 100
+    caractères (un nom de conteneur Docker fait au moins 2 caractères).
+    """
+    slug = _SLUG_INVALID.sub("-", name.lower())[:100].strip("-")
+    return slug if len(slug) >= 2 else f"pipeline-{slug}".rstrip("-")
+
 class Pipeline(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
     name: str
+    slug: str = Field(default="", index=True)  # calculé à la création (pipeline_slug)
     repo_url: str
     github_url: str = Field(default="")  # alias pour repo_url
     branch: str = "main"
@@ -34,7 +49,7 @@ class RunStatus(str, Enum):
 
 class Run(SQLModel, table=True):
     id: int | None = Field(default=None, primary_key=True)
-    pipeline_id: int
+    pipeline_id: int = Field(foreign_key="pipeline.id", index=True)
     status: RunStatus = Field(default=RunStatus.pending)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     finished_at: datetime | None = Field(default=None)
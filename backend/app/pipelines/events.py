@@ -1,14 +1,131 @@
 import asyncio
-from collections import defaultdict
+import time
+
+# Taille de l'anneau par run : un client lent perd les plus vieux événements, la mémoire reste bornée
+RING_SIZE = 4096
+# Anneau gardé après la fin du run : un rafraîchissement de la page Run rejoue encore tout
+RING_GRACE_SEC = 60
+
+class Broadcast:
+    """Anneau partagé par tous les abonnés d'un run.
+
+    `publish` est O(1) quel que soit le nombre de clients : chaque consommateur
+    garde sa propre position `pos` et relit `[pos:seq]` à son rythme.
+    """
+
+    def __init__(self, cap: int = RING_SIZE):
+        self.cap = cap
+        self.buf: list[dict | None] = [None] * cap
+        self.seq = 0
+        self.evt = asyncio.Event()
+        self.subscribers = 0
+
+    def publish(self, event: dict) -> None:
+        self.buf[self.seq % self.cap] = event
+        self.seq += 1
+        # réveille tous les lecteurs en attente, les suivants attendront le nouvel Event
+        e, self.evt = self.evt, asyncio.Event()
+        e.set()
+
+    def read(self, pos: int) -> tuple[list[dict], int, int]:
+        """Événements depuis `pos` -> (événements, nouvelle position, nb perdus).
+
+        `pos > seq` : le client suivait un anneau disparu (redémarrage, run oublié) ;
+        on rejoue celui-ci depuis le début (voir `is_stale`, signalé à part).
+        """
+        if pos > self.seq:
+            pos = 0
+        start = max(pos, self.seq - self.cap)
+        events = [self.buf[i % self.cap] for i in range(start, self.seq)]
+        return events, self.seq, start - pos
+
+    def is_stale(self, pos: int) -> bool:
+        """Position client au-delà de l'anneau : ce n'est pas le flux qu'il suivait."""
+        return pos > self.seq
+
+    async def wait(self, pos: int) -> None:
+        if pos >= self.seq:
+            await self.evt.wait()
 
 class RunEventBus:
     def __init__(self):
-        self._queues = defaultdict(asyncio.Queue)
+        self._channels: dict[int, Broadcast] = {}
+
+    def _channel(self, run_id: int) -> Broadcast:
+        channel = self._channels.get(run_id)
+        if channel is None:
+            channel = self._channels[run_id] = Broadcast()
+        return channel
+
+    def subscribe(self, run_id: int) -> Broadcast:
+        channel = self._channel(run_id)
+        channel.subscribers += 1
+        return channel
 
-    def queue(self, run_id: int) -> asyncio.Queue:
-        return self._queues[run_id]
+    def release(self, run_id: int, channel: Broadcast) -> None:
+        """Désabonnement SSE. L'anneau vit jusqu'à `close()` (fin du run), sauf s'il
+        est resté vide : abonné à un run pas encore démarré ou déjà oublié."""
+        channel.subscribers -= 1
+        if channel.subscribers <= 0 and channel.seq == 0 and self._channels.get(run_id) is channel:
+            del self._channels[run_id]
+
+    def close(self, run_id: int, grace_sec: float = RING_GRACE_SEC) -> None:
+        """Fin du run : l'anneau est libéré après `grace_sec`, qu'il ait des abonnés ou non."""
+        channel = self._channels.get(run_id)
+        if channel is None:
+            return
+
+        def _drop() -> None:
+            if self._channels.get(run_id) is channel:
+                del self._channels[run_id]
+
+        asyncio.get_running_loop().call_later(grace_sec, _drop)
 
     async def publish(self, run_id: int, event: dict):
-        await self._queues[run_id].put(event)
+        self._channel(run_id).publish(event)
 
 bus = RunEventBus()
+
+class BatchingPublisher:
+    """Regroupe les lignes de log d'un run en événements `log_batch`.
+
+    Un seul événement (et donc un seul réveil/encodage côté SSE) pour au plus
+    `max_lines` lignes ou `max_ms` millisecondes (minuterie : une ligne isolée
+    n'attend pas la suivante). Appeler `flush()` avant tout événement de fin
+    d'étape pour conserver l'ordre.
+    """
+
+    def __init__(self, bus: RunEventBus, run_id: int, max_lines: int = 64, max_ms: int = 50):
+        self._bus = bus
+        self._run_id = run_id
+        self._max_lines = max_lines
+        self._max_sec = max_ms / 1000
+        self._step: str | None = None
+        self._lines: list[str] = []
+        self._first_at = 0.0
+        self._timer: asyncio.TimerHandle | None = None
+
+    async def log(self, step: str, line: str) -> None:
+        if self._lines and step != self._step:
+            await self.flush()
+        if not self._lines:
+            self._step = step
+            self._first_at = time.monotonic()
+            self._timer = asyncio.get_running_loop().call_later(self._max_sec, self._flush_later)
+        self._lines.append(line)
+        if len(self._lines) >= self._max_lines or time.monotonic() - self._first_at >= self._max_sec:
+            await self.flush()
+
+    def _flush_later(self) -> None:
+        self._timer = None
+        asyncio.ensure_future(self.flush())
+
+    async def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._lines:
+            return
+        lines, self._lines = self._lines, []
+        await self._bus.publish(self._run_id, {"type": "log_batch", "step": self._step, "lines": lines})
+
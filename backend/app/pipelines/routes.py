@@ -1,26 +1,84 @@
-from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException
-from fastapi.responses import PlainTextResponse
+import asyncio
+import orjson
+from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException, Query, Request
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 from sse_starlette.sse import EventSourceResponse
 from sqlmodel import Session, select
-from pathlib import Path
+import os
+from threading import Lock
+from cachetools import LRUCache
+from ..config import settings
 from ..db import get_session
-from ..models import Pipeline, Run, RunStatus, User, Role
-from ..auth.proxy import get_current_user, require_role
+from ..models import Pipeline, Run, RunStatus, User, pipeline_slug
+from ..schemas import PipelineRead
+from ..auth.proxy import get_current_user, require_dev
 from .events import bus
 from .runner_fake import run_fake
-from .runner_real import run_real_pipeline  # Import du vrai runner
+from .runner_real import run_real_pipeline, WORKSPACES_ROOT  # Import du vrai runner
 
 router = APIRouter(prefix="/api", tags=["CI/CD Pipelines"])
 
+# Keepalive SSE : les proxys (nginx, ELB) coupent les connexions inactives vers 60 s
+_SSE_PING_SEC = 15
+
+# Runner choisi une fois au démarrage (USE_REAL_RUNNER)
+_run_pipeline_bg = run_real_pipeline if settings.use_real_runner else run_fake
+
+# Gros blocs : beaucoup moins d'appels read(2) sur les logs de plusieurs Mo
+_LOG_CHUNK_SIZE = 1 << 20
+_WORKSPACES_ROOT_RESOLVED = WORKSPACES_ROOT.resolve()
+
+# run_id -> pipeline_id des runs terminés (immuables) : le polling des logs
+# d'un run fini ne refait plus de SELECT
+_finished_run_pipeline: LRUCache = LRUCache(maxsize=1024)
+_finished_run_pipeline_lock = Lock()
+
+def _iter_log_file(f, remaining: int):
+    """Lit le fichier par blocs (générateur sync : Starlette l'itère dans le threadpool)."""
+    try:
+        while remaining > 0:
+            chunk = f.read(min(_LOG_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+def _tail_bytes(path, n: int, block: int = 1 << 16) -> bytes:
+    """N dernières lignes du fichier, lu à rebours par blocs depuis la fin."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        # blocs gardés dans l'ordre de lecture, un seul join à la fin (pas de recopie par bloc)
+        blocks: list[bytes] = []
+        newlines = 0
+        # n+1 sauts de ligne : la première ligne du tampon peut être incomplète
+        while pos > 0 and newlines <= n:
+            size = min(block, pos)
+            pos -= size
+            f.seek(pos)
+            chunk = f.read(size)
+            blocks.append(chunk)
+            newlines += chunk.count(b"\n")
+    lines = b"".join(reversed(blocks)).splitlines(keepends=True)
+    return b"".join(lines[-n:])
+
 @router.get(
     "/pipelines",
+    response_model=list[PipelineRead],
     summary="List all pipelines",
     description="""
     Retrieve a list of all configured CI/CD pipelines.
     
     **Permissions:** Any authenticated user
     
-    Returns all pipeline configurations with their current status.
+    Returns pipeline configurations with their current status, newest first.
+    
+    **Pagination:**
+    - `limit` (default 50, max 500) and `offset` (default 0)
+    - or keyset: `before_id` returns pipelines with an id lower than the given one
+      (stable and constant-cost on deep pages)
     """,
     responses={
         200: {
@@ -35,8 +93,7 @@ router = APIRouter(prefix="/api", tags=["CI/CD Pipelines"])
                             "github_url": "https://github.com/user/repo.git",
                             "branch": "main",
                             "status": "success",
-                            "created_by": "john_doe",
-                            "created_at": "2026-01-06T10:30:00Z"
+                            "created_by": "john_doe"
                         }
                     ]
                 }
@@ -45,11 +102,20 @@ router = APIRouter(prefix="/api", tags=["CI/CD Pipelines"])
     }
 )
 def list_pipelines(
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    before_id: int | None = Query(None, ge=1),
     session: Session = Depends(get_session),
     user: User = Depends(get_current_user),
 ):
     """List all pipelines."""
-    return session.exec(select(Pipeline).order_by(Pipeline.id.desc())).all()
+    stmt = select(
+        Pipeline.id, Pipeline.name, Pipeline.repo_url, Pipeline.github_url,
+        Pipeline.branch, Pipeline.status, Pipeline.created_by,
+    ).order_by(Pipeline.id.desc())
+    if before_id is not None:
+        stmt = stmt.where(Pipeline.id < before_id)
+    return session.exec(stmt.offset(offset).limit(limit)).all()
 
 @router.post(
     "/pipelines",
@@ -64,7 +130,7 @@ def list_pipelines(
     
     **Workflow:**
     1. Clone repository
-    2. Run Maven tests (./mvnw clean compile && ./mvnw test)
+    2. Run Maven tests (./mvnw clean test)
     3. Build Docker image
     4. Ship image to remote server via SSH (cloudprojet@100.68.111.86)
     5. Deploy container
@@ -103,7 +169,7 @@ def list_pipelines(
 def create_pipeline(
     payload: dict,
     session: Session = Depends(get_session),
-    user: User = Depends(require_role(Role.admin, Role.dev)),
+    user: User = Depends(require_dev),
 ):
     """Create a new pipeline (dev or admin only)."""
     name = payload.get("name")
@@ -114,6 +180,7 @@ def create_pipeline(
 
     p = Pipeline(
         name=name, 
+        slug=pipeline_slug(name),
         repo_url=repo_url, 
         github_url=repo_url,
         branch=branch,
@@ -122,7 +189,7 @@ def create_pipeline(
     )
     session.add(p)
     session.commit()
-    session.refresh(p)
+    # id renseigné au flush, le reste est déjà en mémoire : pas de refresh
     return p
 
 @router.post(
@@ -137,8 +204,7 @@ def create_pipeline(
     **Execution steps:**
     1. **Checkout**: Clone the Git repository to `~/.cicd/workspaces/pipeline-{id}/`
     2. **Maven Tests**: Build and run tests with Maven in demo/ directory
-       - `./mvnw -B clean compile`
-       - `./mvnw -B test` (pipeline fails if tests fail)
+       - `./mvnw -B clean test` (pipeline fails if compilation or tests fail)
     3. **Docker Build**: Create Docker image from demo/ directory
     4. **Ship Image**: Transfer image to cloudprojet@100.68.111.86 via SSH
     5. **Deploy**: Start container on remote server (port 8080)
@@ -168,7 +234,7 @@ def run_pipeline(
     pipeline_id: int,
     bg: BackgroundTasks,
     session: Session = Depends(get_session),
-    user: User = Depends(require_role(Role.admin, Role.dev)),
+    user: User = Depends(require_dev),
 ):
     """Trigger a pipeline run (dev or admin only)."""
     p = session.get(Pipeline, pipeline_id)
@@ -178,16 +244,8 @@ def run_pipeline(
     run = Run(pipeline_id=pipeline_id, status=RunStatus.running, created_by=user.id)
     session.add(run)
     session.commit()
-    session.refresh(run)
 
-    # Choisir le runner : fake pour demo, real pour production
-    use_real_runner = True  # Mettre à True pour utiliser le vrai runner
-    
-    if use_real_runner:
-        bg.add_task(run_real_pipeline, run.id)
-    else:
-        bg.add_task(run_fake, run.id)
-    
+    bg.add_task(_run_pipeline_bg, run.id)
     return {"runId": run.id}
 
 @router.get(
@@ -244,6 +302,8 @@ def run_history(
     - `run_start`: Pipeline execution started
     - `step_start`: New step started (checkout, maven_tests, docker_build, ship_image_ssh, deploy_run, healthcheck)
     - `log`: Log message from current step
+    - `log_batch`: Several log lines from current step (`lines` array)
+    - `dropped`: `count` older events were discarded because the client was reading too slowly
     - `step_success`: Step completed successfully
     - `run_success`: Pipeline completed successfully
     - `run_failed`: Pipeline failed with error message
@@ -272,17 +332,40 @@ def run_history(
 )
 async def run_events(
     run_id: int,
+    request: Request,
     user: User = Depends(get_current_user),
 ):
     """Stream run events (SSE)."""
-    q = bus.queue(run_id)
+    channel = bus.subscribe(run_id)
+    # reconnexion EventSource : on reprend après le dernier id reçu au lieu de tout rejouer
+    last_id = request.headers.get("last-event-id", "")
+    pos = int(last_id) if last_id.isdigit() else 0
 
     async def event_gen():
-        while True:
-            evt = await q.get()
-            yield {"event": "message", "data": evt}
+        nonlocal pos
+        try:
+            if channel.is_stale(pos):
+                # discontinuité, pas des événements perdus : le client sait que l'historique live a disparu
+                yield {"event": "message", "data": orjson.dumps({"type": "stream_reset"}).decode()}
+            while not await request.is_disconnected():
+                events, pos, dropped = channel.read(pos)
+                if dropped:
+                    yield {"event": "message", "data": orjson.dumps({"type": "dropped", "count": dropped}).decode()}
+                if not events:
+                    try:
+                        await asyncio.wait_for(channel.wait(pos), timeout=_SSE_PING_SEC)
+                    except asyncio.TimeoutError:
+                        # rien à envoyer : on reboucle pour revérifier la déconnexion
+                        pass
+                    continue
+                first = pos - len(events)
+                for i, evt in enumerate(events, start=first + 1):
+                    # JSON pré-sérialisé (sinon sse-starlette envoie str(dict), non parsable côté client)
+                    yield {"event": "message", "id": str(i), "data": orjson.dumps(evt).decode()}
+        finally:
+            bus.release(run_id, channel)
 
-    return EventSourceResponse(event_gen())
+    return EventSourceResponse(event_gen(), ping=_SSE_PING_SEC)
 
 
 @router.get(
@@ -297,6 +380,9 @@ async def run_events(
     This endpoint reads the log file created during pipeline execution.
     The file is located at: `~/.cicd/workspaces/pipeline-{pipeline_id}/logs/run-{run_id}.log`
     
+    **Query parameters:**
+    - `tail` (optional): return only the last N lines (read backwards from the end of the file)
+    
     **Usage:**
     - Poll this endpoint to get updated logs during execution
     - Display logs after run completion
@@ -323,25 +409,61 @@ async def run_events(
 )
 def get_run_logs(
     run_id: int,
+    tail: int | None = Query(None, ge=1, le=100_000),
     session: Session = Depends(get_session),
     user: User = Depends(get_current_user),
 ):
     """Get log file content for a run."""
-    # Get run to find pipeline_id
-    run = session.get(Run, run_id)
-    if not run:
-        raise HTTPException(status_code=404, detail="Run not found")
+    with _finished_run_pipeline_lock:
+        pipeline_id = _finished_run_pipeline.get(run_id)
+    finished = pipeline_id is not None
+    if not finished:
+        # Get run to find pipeline_id
+        run = session.get(Run, run_id)
+        if not run:
+            raise HTTPException(status_code=404, detail="Run not found")
+        pipeline_id = run.pipeline_id
+        finished = run.status not in (RunStatus.running, RunStatus.pending)
+        if finished:
+            with _finished_run_pipeline_lock:
+                _finished_run_pipeline[run_id] = pipeline_id
     
     # Build log file path
-    log_file = Path.home() / ".cicd" / "workspaces" / f"pipeline-{run.pipeline_id}" / "logs" / f"run-{run_id}.log"
+    log_file = WORKSPACES_ROOT / f"pipeline-{pipeline_id}" / "logs" / f"run-{run_id}.log"
     
     if not log_file.exists():
         raise HTTPException(status_code=404, detail="Log file not found")
+    # Refuse un lien symbolique qui sortirait des workspaces
+    if not log_file.resolve().is_relative_to(_WORKSPACES_ROOT_RESOLVED):
+        raise HTTPException(status_code=404, detail="Log file not found")
     
-    # Read and return log content
+    # ?tail=N : seulement les dernières lignes, sans parcourir tout le fichier
+    if tail is not None:
+        try:
+            return PlainTextResponse(_tail_bytes(log_file, tail))
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error reading log file: {str(e)}")
+
+    # Run terminé : fichier immuable -> FileResponse (Range, ETag, Last-Modified, HEAD)
+    if finished:
+        return FileResponse(
+            log_file,
+            media_type="text/plain; charset=utf-8",
+            filename=log_file.name,
+            content_disposition_type="inline",
+        )
+
+    # Run en cours : stream borné à la taille à l'ouverture (le fichier grossit encore)
     try:
-        with open(log_file, 'r') as f:
-            content = f.read()
-        return content
+        # Lectures directes de _LOG_CHUNK_SIZE octets, sans tampon intermédiaire ni décodage
+        f = open(log_file, "rb", buffering=0)
+        # Taille figée à l'ouverture : le runner peut encore écrire dans le fichier
+        size = os.fstat(f.fileno()).st_size
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error reading log file: {str(e)}")
+
+    return StreamingResponse(
+        _iter_log_file(f, size),
+        media_type="text/plain; charset=utf-8",
+        headers={"Content-Length": str(size)},
+    )
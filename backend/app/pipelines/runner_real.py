@@ -1,160 +1,424 @@
 import asyncio
+import fcntl
+import os
 import shutil
-import subprocess
+import signal
+from collections import deque
+from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import AsyncIterator, Optional
 
+import httpx
+from sqlalchemy import update
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from ..db import engine
-from ..models import Pipeline, Run, RunStatus
-from .events import bus
+from ..config import settings
+from ..db import async_engine, engine
+from ..models import Pipeline, Run, RunStatus, pipeline_slug
+from .events import BatchingPublisher, bus
 
 
 # ----------------------------
 # Helpers: SSE events & logging
 # ----------------------------
 
-# Global dict to store log file paths for each run
-_log_files = {}
-
-def _get_log_file(pipeline_id: int, run_id: int) -> Path:
-    """Get or create log file path for a run."""
-    if run_id not in _log_files:
-        log_dir = Path.home() / ".cicd" / "workspaces" / f"pipeline-{pipeline_id}" / "logs"
-        log_dir.mkdir(parents=True, exist_ok=True)
-        log_file = log_dir / f"run-{run_id}.log"
-        _log_files[run_id] = log_file
-        # Initialize log file with header
-        with open(log_file, 'w') as f:
-            f.write(f"=== Pipeline Run {run_id} - {datetime.utcnow().isoformat()} ===\n\n")
-    return _log_files[run_id]
-
-def _write_to_log(log_file: Path, message: str):
+# Racine des workspaces, calculée une fois au chargement
+WORKSPACES_ROOT = Path(os.path.expanduser("~/.cicd/workspaces"))
+# Dépôt Maven local partagé par tous les runs (dépendances téléchargées une seule fois)
+M2_REPO = WORKSPACES_ROOT.parent / "m2"
+# Sockets ControlMaster ssh (une connexion maître par hôte de déploiement)
+SSH_CONTROL_DIR = WORKSPACES_ROOT.parent / "ssh"
+
+# Tampon d'écriture des logs : un write() système par ~64 Ko au lieu d'un open/write/close par ligne
+LOG_BUFFER_SIZE = 64 * 1024
+# Délai max avant qu'une ligne écrite soit visible dans le fichier (GET /runs/{id}/logs)
+LOG_FLUSH_SEC = 0.5
+
+
+class _RunLog:
+    """Fichier de log d'un run, ouvert une seule fois pour toute la durée du run.
+
+    Écritures tamponnées ; une minuterie vide le tampon au plus LOG_FLUSH_SEC après
+    la première ligne en attente, même si le run reste ensuite silencieux (ship, etc.).
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._f = open(path, "w+b", buffering=LOG_BUFFER_SIZE)
+        self._timer: asyncio.TimerHandle | None = None
+
+    def write(self, data: bytes, flush: bool = False) -> None:
+        if self._f.closed:
+            # run terminé (ex. échec après la fermeture du log) : seul le SSE reçoit la ligne
+            return
+        self._f.write(data)
+        if flush:
+            self.flush()
+        elif self._timer is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                # hors boucle (usage synchrone) : pas de minuterie, on vide tout de suite
+                self._f.flush()
+                return
+            self._timer = loop.call_later(LOG_FLUSH_SEC, self.flush)
+
+    def flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._f.closed:
+            self._f.flush()
+
+    def reopen_if_removed(self) -> None:
+        """Le checkout peut supprimer le workspace (logs compris) : on recrée le fichier sans rien perdre."""
+        if self.path.exists():
+            return
+        self._f.flush()
+        self._f.seek(0)
+        content = self._f.read()
+        self._f.close()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f = open(self.path, "w+b", buffering=LOG_BUFFER_SIZE)
+        self._f.write(content)
+
+    def close(self) -> None:
+        """Vide et ferme le fichier (idempotent)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._f.closed:
+            return
+        self.reopen_if_removed()
+        self._f.close()
+
+
+def _open_run_log(pipeline_id: int, run_id: int) -> _RunLog:
+    """Create log file for a run."""
+    log_dir = WORKSPACES_ROOT / f"pipeline-{pipeline_id}" / "logs"
+    log_dir.mkdir(parents=True, exist_ok=True)
+    run_log = _RunLog(log_dir / f"run-{run_id}.log")
+    # Initialize log file with header
+    run_log.write(f"=== Pipeline Run {run_id} - {datetime.utcnow().isoformat()} ===\n\n".encode())
+    return run_log
+
+
+@dataclass(slots=True)
+class _RunContext:
+    """État d'un run en cours, passé aux helpers (plus de dicts globaux indexés par run_id)."""
+    run_id: int
+    log: _RunLog
+    # lignes de log SSE groupées en événements `log_batch` (un publish pour jusqu'à 64 lignes)
+    publisher: BatchingPublisher
+
+
+def _write_to_log(log_file: _RunLog, message: str, flush: bool = False):
     """Write a message to the log file."""
-    # Ensure parent directory exists
-    log_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(log_file, 'a') as f:
-        f.write(f"{message}\n")
-
-async def _emit(run_id: int, evt: dict, pipeline_id: int = None):
-    """Publish event to SSE bus."""
-    await bus.publish(run_id, evt)
-
-async def _step_start(run_id: int, step: str, pipeline_id: int = None):
-    if pipeline_id:
-        log_file = _get_log_file(pipeline_id, run_id)
-        _write_to_log(log_file, f"\n>>> STEP: {step}")
-    await _emit(run_id, {"type": "step_start", "step": step})
-
-async def _step_ok(run_id: int, step: str, pipeline_id: int = None):
-    if pipeline_id:
-        log_file = _get_log_file(pipeline_id, run_id)
-        _write_to_log(log_file, f"✓ STEP COMPLETED: {step}")
-    await _emit(run_id, {"type": "step_success", "step": step})
-
-async def _log(run_id: int, step: str, line: str, pipeline_id: int = None):
-    message = line.rstrip("\n")
-    if pipeline_id:
-        log_file = _get_log_file(pipeline_id, run_id)
-        _write_to_log(log_file, f"[{step}] {message}")
-    await _emit(run_id, {"type": "log", "step": step, "message": message})
+    log_file.write(message.encode() + b"\n", flush)
+
+@lru_cache(maxsize=64)
+def _step_prefix(step: str) -> bytes:
+    """Préfixe `[step] ` encodé une fois par étape, pas à chaque ligne."""
+    return f"[{step}] ".encode()
+
+async def _emit(ctx: _RunContext, evt: dict):
+    """Publish event to SSE bus (après les lignes de log en attente, pour garder l'ordre)."""
+    await ctx.publisher.flush()
+    await bus.publish(ctx.run_id, evt)
+
+async def _step_start(ctx: _RunContext, step: str):
+    _write_to_log(ctx.log, f"\n>>> STEP: {step}", flush=True)
+    await _emit(ctx, {"type": "step_start", "step": step})
+
+async def _step_ok(ctx: _RunContext, step: str):
+    ctx.log.reopen_if_removed()
+    _write_to_log(ctx.log, f"✓ STEP COMPLETED: {step}", flush=True)
+    await _emit(ctx, {"type": "step_success", "step": step})
+
+async def _log(ctx: _RunContext, step: str, line: str | bytes):
+    # sortie des commandes : bytes bruts écrits tels quels, décodés une seule fois pour le SSE
+    raw = line if isinstance(line, bytes) else line.encode(errors="replace")
+    raw = raw.rstrip(b"\n")
+    # les erreurs sont visibles tout de suite
+    ctx.log.write(_step_prefix(step) + raw + b"\n", flush=step == "error")
+    await ctx.publisher.log(step, raw.decode(errors="replace"))
 
 
 # ----------------------------
 # Helpers: process execution
 # ----------------------------
 
-def _run_cmd(cmd: list[str], cwd: Optional[str] = None) -> Iterable[str]:
-    """Run command and yield merged stdout/stderr lines. Raises RuntimeError on non-zero exit."""
-    p = subprocess.Popen(
-        cmd,
+# Limite d'une ligne lue sur stdout (64 Ko par défaut dans asyncio, trop court pour certains logs Maven/Docker)
+_STREAM_LIMIT = 1 << 20
+
+
+async def _run_cmd(cmd: list[str], cwd: Optional[str] = None) -> AsyncIterator[bytes]:
+    """Run command and yield merged stdout/stderr lines (bytes). Raises RuntimeError on non-zero exit.
+
+    Sous-processus asyncio : la boucle reste libre pendant les étapes longues (SSE, API, autres runs).
+    """
+    p = await asyncio.create_subprocess_exec(
+        *cmd,
         cwd=cwd,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        limit=_STREAM_LIMIT,
     )
     assert p.stdout is not None
-    for line in p.stdout:
+    async for line in p.stdout:
         yield line
-    rc = p.wait()
+    rc = await p.wait()
     if rc != 0:
         raise RuntimeError(f"Command failed ({rc}): {' '.join(cmd)}")
 
 
+async def _drain(cmd: list[str], cwd: Optional[str] = None) -> None:
+    """Run command, discarding its output."""
+    async for _ in _run_cmd(cmd, cwd=cwd):
+        pass
+
+
+async def _succeeds(cmd: list[str]) -> bool:
+    """Code retour 0 ? (sortie ignorée, pas d'exception)"""
+    p = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    return await p.wait() == 0
+
+
 def _workspace(pipeline_id: int) -> Path:
-    base = Path.home() / ".cicd" / "workspaces"
-    base.mkdir(parents=True, exist_ok=True)
-    return base / f"pipeline-{pipeline_id}"
+    WORKSPACES_ROOT.mkdir(parents=True, exist_ok=True)
+    return WORKSPACES_ROOT / f"pipeline-{pipeline_id}"
+
 
+async def _git_checkout(repo_url: str, branch: str, ws: Path) -> None:
+    """Ensure workspace contains up-to-date checkout of repo@branch.
 
-def _git_checkout(repo_url: str, branch: str, ws: Path) -> None:
-    """Ensure workspace contains up-to-date checkout of repo@branch."""
+    Clone superficiel (--depth=1) puis fetch du seul dernier commit aux runs suivants :
+    l'historique n'est jamais re-téléchargé.
+    """
     if ws.exists() and (ws / ".git").exists():
-        for _ in _run_cmd(["git", "fetch", "--all", "--prune"], cwd=str(ws)):
-            pass
-        for _ in _run_cmd(["git", "checkout", branch], cwd=str(ws)):
-            pass
-        for _ in _run_cmd(["git", "reset", "--hard", f"origin/{branch}"], cwd=str(ws)):
-            pass
+        await _drain(["git", "-C", str(ws), "fetch", "--depth=1", "--no-tags", "origin", branch])
+        await _drain(["git", "-C", str(ws), "reset", "--hard", "FETCH_HEAD"])
+        # logs/ (non suivi) contient les logs des runs, y compris celui en cours
+        await _drain(["git", "-C", str(ws), "clean", "-fdx", "-e", "logs/"])
     else:
         if ws.exists():
-            shutil.rmtree(ws)
+            # des milliers d'unlink() : hors de la boucle d'événements
+            await asyncio.to_thread(shutil.rmtree, ws)
         ws.parent.mkdir(parents=True, exist_ok=True)
-        for _ in _run_cmd(["git", "clone", "--branch", branch, "--single-branch", repo_url, str(ws)]):
-            pass
+        await _drain(["git", "clone", "--depth=1", "--branch", branch, "--single-branch", repo_url, str(ws)])
 
 
-def _ssh_exec(user: str, host: str, port: int, remote_cmd: str) -> Iterable[str]:
-    return _run_cmd(["ssh", "-p", str(port), f"{user}@{host}", remote_cmd])
+# Un verrou par pipeline : deux runs simultanés ne doivent pas se marcher dessus
+# dans le même workspace (reset/clean git pendant un docker build)
+_workspace_locks: dict[int, asyncio.Lock] = {}
 
 
-def _docker_save_and_load_over_ssh(user: str, host: str, port: int, image_tag: str) -> None:
-    """docker save <image_tag> | ssh user@host "docker load" """
-    save = subprocess.Popen(
-        ["docker", "save", image_tag],
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-    )
-    assert save.stdout is not None
-
-    load = subprocess.Popen(
-        ["ssh", "-p", str(port), f"{user}@{host}", "docker load"],
-        stdin=save.stdout,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        bufsize=1,
-    )
-    save.stdout.close()
+def _workspace_lock(pipeline_id: int) -> asyncio.Lock:
+    return _workspace_locks.setdefault(pipeline_id, asyncio.Lock())
 
-    output = []
-    assert load.stdout is not None
-    for line in load.stdout:
-        output.append(line)
 
-    rc = load.wait()
-    save.wait()
-    if rc != 0:
-        raise RuntimeError("docker load over ssh failed:\n" + "".join(output))
+async def _git_tree_hash(ws: Path, subdir: str = "") -> str:
+    """Hash git de l'arbre source au commit courant (déjà calculé par git, aucun fichier relu)."""
+    out = b"".join([line async for line in _run_cmd(["git", "-C", str(ws), "rev-parse", f"HEAD:{subdir}"])])
+    return out.decode().strip()
+
+
+def _has_aes_ni() -> bool:
+    try:
+        with open("/proc/cpuinfo") as f:
+            return any(line.startswith("flags") and " aes " in f"{line} " for line in f)
+    except OSError:
+        return False
+
+
+# Chiffrements AEAD (chiffrement + MAC en une passe), AES-GCM d'abord si le CPU a AES-NI ;
+# aes128-ctr reste en dernier recours pour les serveurs anciens
+_SSH_CIPHERS = ",".join(
+    ["aes128-gcm@openssh.com", "chacha20-poly1305@openssh.com"] if _has_aes_ni()
+    else ["chacha20-poly1305@openssh.com", "aes128-gcm@openssh.com"]
+) + ",aes128-ctr"
+
+
+def _ssh_cmd(user: str, host: str, port: int, remote_cmd: str) -> list[str]:
+    """Commande ssh multiplexée : les appels d'un même déploiement partagent une connexion (gardée 60 s)."""
+    SSH_CONTROL_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+    return [
+        "ssh", "-p", str(port),
+        "-o", "ControlMaster=auto",
+        "-o", f"ControlPath={SSH_CONTROL_DIR}/%C",
+        "-o", "ControlPersist=60",
+        "-o", f"Ciphers={_SSH_CIPHERS}",
+        "-o", "IPQoS=throughput",
+        # hôte injoignable ou connexion morte : échec en secondes plutôt qu'un run bloqué
+        # (pas de timeout global : un docker load peut légitimement durer plusieurs minutes)
+        "-o", "BatchMode=yes",
+        "-o", "ConnectTimeout=10",
+        "-o", "ServerAliveInterval=15",
+        "-o", "ServerAliveCountMax=3",
+        f"{user}@{host}", remote_cmd,
+    ]
+
+
+# Script de déploiement distant, un seul aller-retour ssh ; le echo garde le message
+# de démarrage à sa place dans le log. Les noms viennent de pipeline_slug() : [a-z0-9-]
+_DEPLOY_SCRIPT = (
+    "docker rm -f {container_name} 2>/dev/null || true; "
+    "echo 'Starting new container: {container_name}'; "
+    "docker run {image_tag}"
+)
+
+
+def _ssh_exec(user: str, host: str, port: int, remote_cmd: str) -> AsyncIterator[bytes]:
+    return _run_cmd(_ssh_cmd(user, host, port, remote_cmd))
+
 
+# Pipes de 1 Mo entre docker save / pigz / ssh (64 Ko par défaut : 16x plus de réveils)
+_PIPE_SIZE = 1 << 20
 
-def _healthcheck(url: str, timeout_sec: int = 2, retries: int = 25, delay_sec: float = 0.5) -> bool:
-    """Simple HTTP GET healthcheck."""
-    import urllib.request
-    import time
 
-    for _ in range(retries):
+def _enlarge_pipe(fd: int) -> None:
+    """Best-effort : F_SETPIPE_SZ n'existe que sous Linux et est plafonné par /proc/sys/fs/pipe-max-size."""
+    if hasattr(fcntl, "F_SETPIPE_SZ"):
         try:
-            with urllib.request.urlopen(url, timeout=timeout_sec) as r:
-                if 200 <= r.status < 300:
-                    return True
-        except Exception:
+            fcntl.fcntl(fd, fcntl.F_SETPIPE_SZ, _PIPE_SIZE)
+        except OSError:
             pass
-        time.sleep(delay_sec)
-    return False
+
+
+# pigz (gzip multi-cœurs) s'il est installé ; `docker load` détecte seul une archive gzip
+_PIGZ = shutil.which("pigz")
+
+
+async def _docker_save_and_load_over_ssh(user: str, host: str, port: int, image_tag: str, *extra_tags: str) -> None:
+    """docker save <image_tag> [extra_tags...] [| pigz -1] | ssh user@host "docker load" """
+    producers = [["docker", "save", image_tag, *extra_tags]]
+    if _PIGZ:
+        producers.append([_PIGZ, "-1"])
+
+    # Pipes OS entre les process : les octets de l'image ne passent pas par Python
+    procs = []
+    stdin = None
+    try:
+        for cmd in producers:
+            read_fd, write_fd = os.pipe()
+            _enlarge_pipe(write_fd)
+            try:
+                procs.append(await asyncio.create_subprocess_exec(
+                    *cmd,
+                    stdin=stdin,
+                    stdout=write_fd,
+                    stderr=asyncio.subprocess.PIPE,
+                ))
+            finally:
+                os.close(write_fd)
+                if stdin is not None:
+                    os.close(stdin)
+                stdin = read_fd
+        load = await asyncio.create_subprocess_exec(
+            *_ssh_cmd(user, host, port, "docker load"),
+            stdin=stdin,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            limit=_STREAM_LIMIT,
+        )
+    finally:
+        if stdin is not None:
+            os.close(stdin)
+
+    # seules les dernières lignes servent au message d'erreur : mémoire bornée
+    tail: deque[bytes] = deque(maxlen=200)
+
+    async def _read_load() -> int:
+        assert load.stdout is not None
+        async for line in load.stdout:
+            tail.append(line)
+        return await load.wait()
+
+    # stderr des producteurs lu en parallèle (sinon un pipe plein les bloquerait)
+    *producer_results, rc = await asyncio.gather(*(p.communicate() for p in procs), _read_load())
+    for cmd, proc, (_, err) in zip(producers, procs, producer_results):
+        # SIGPIPE : le consommateur est mort avant, c'est son erreur qui compte
+        if proc.returncode not in (0, -signal.SIGPIPE):
+            raise RuntimeError(
+                f"{Path(cmd[0]).name} {cmd[1]} failed (exit {proc.returncode}):\n" + err[-2000:].decode(errors="replace")
+            )
+    if rc != 0:
+        raise RuntimeError("docker load over ssh failed:\n" + b"".join(tail).decode(errors="replace"))
+
+
+async def _push_and_pull_over_ssh(user: str, host: str, port: int, image_tag: str, *extra_tags: str) -> AsyncIterator[bytes]:
+    """docker push <registry/image> puis ssh user@host "docker pull" : seules les couches absentes sont transférées."""
+    async for line in _run_cmd(["docker", "push", image_tag]):
+        yield line
+    remote_cmd = " && ".join([f"docker pull {image_tag}", *(f"docker tag {image_tag} {t}" for t in extra_tags)])
+    async for line in _ssh_exec(user, host, port, remote_cmd):
+        yield line
+
+
+async def _healthcheck(url: str, timeout_sec: float = 2, deadline_sec: float = 60) -> bool:
+    """HTTP GET healthcheck, avec backoff exponentiel (0.25 s -> 2 s) et connexion keep-alive.
+
+    60 s au total, comme les 25 essais d'origine : le temps d'un démarrage à froid Spring Boot.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + deadline_sec
+    attempt = 0
+    async with httpx.AsyncClient(timeout=timeout_sec) as client:
+        while True:
+            try:
+                r = await client.get(url)
+                if 200 <= r.status_code < 300:
+                    return True
+            except httpx.HTTPError:
+                pass
+            delay = min(2.0, 0.25 * 2 ** attempt)
+            if loop.time() + delay >= deadline:
+                return False
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+def reap_interrupted_runs() -> int:
+    """Passe en FAILED les runs restés RUNNING après un arrêt/crash du process.
+
+    Les runs tournent dans le process de l'API : au démarrage, aucun run
+    RUNNING ne peut encore être vivant.
+    """
+    with Session(engine) as session:
+        result = session.exec(
+            update(Run)
+            .where(Run.status == RunStatus.running)
+            .values(status=RunStatus.failed, finished_at=datetime.utcnow())
+        )
+        session.commit()
+        return result.rowcount
+
+
+async def _load_pipeline(run_id: int) -> Optional[Pipeline]:
+    """Pipeline du run ; la session est fermée avant les étapes longues (pas de connexion gardée)."""
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        run = await session.get(Run, run_id)
+        if not run:
+            return None
+        return await session.get(Pipeline, run.pipeline_id)
+
+
+async def _persist_run_status(run_id: int, status: RunStatus) -> None:
+    """Statut final du run, via le driver async (pas d'I/O DB bloquante sur la boucle)."""
+    async with AsyncSession(async_engine) as session:
+        await session.execute(
+            update(Run)
+            .where(Run.id == run_id)
+            .values(status=status, finished_at=datetime.utcnow())
+        )
+        await session.commit()
 
 
 # ----------------------------
@@ -165,138 +429,152 @@ async def run_real_pipeline(run_id: int):
     """
     Real pipeline runner - version simplifiée:
       1) Clone le repo Git
-      2) Build with Maven (./mvnw -B clean compile)
-      3) Run tests (./mvnw -B test)
-      4) Docker build (si tests passent)
-      5) Ship image via SSH
-      6) Docker run on remote
-      7) Healthcheck
+      2) Build + tests with Maven (./mvnw -B clean test)
+      3) Docker build (si tests passent)
+      4) Ship image via SSH
+      5) Docker run on remote
+      6) Healthcheck
     """
     # Configuration SSH en dur
     DEPLOY_USER = "cloudprojet"
     DEPLOY_HOST = "100.68.111.86"
     DEPLOY_PORT = 22
     
-    with Session(engine) as session:
-        run = session.get(Run, run_id)
-        if not run:
-            return
-
-        pipeline = session.get(Pipeline, run.pipeline_id)
-        if not pipeline:
-            return
-
-        # Mark run as running
-        run.status = RunStatus.running
-        session.add(run)
-        session.commit()
-
-        # Sanitize pipeline name for Docker (no spaces, lowercase)
-        sanitized_name = pipeline.name.lower().replace(" ", "-")
-        image_tag = f"{sanitized_name}:run-{run_id}"
-        container_name = sanitized_name
-
-        try:
-            await _emit(run_id, {"type": "run_start"}, pipeline.id)
-
-            # STEP: checkout
-            step = "checkout"
-            await _step_start(run_id, step, pipeline.id)
+    pipeline = await _load_pipeline(run_id)
+    if not pipeline:
+        return
+
+    # Le run est déjà créé en RUNNING par run_pipeline (même transaction que l'INSERT)
+
+    # Nom Docker (minuscules, sans espaces) calculé une fois à la création
+    sanitized_name = pipeline.slug or pipeline_slug(pipeline.name)
+    image_repo = sanitized_name
+    if settings.deploy_registry:
+        # tag directement au nom du registre : pas de `docker tag` supplémentaire
+        image_repo = f"{settings.deploy_registry}/{image_repo}"
+    image_tag = f"{image_repo}:run-{run_id}"
+    container_name = sanitized_name
+
+    ctx = _RunContext(run_id, _open_run_log(pipeline.id, run_id), BatchingPublisher(bus, run_id))
+    try:
+        await _emit(ctx, {"type": "run_start"})
+
+        # STEP: checkout
+        step = "checkout"
+        await _step_start(ctx, step)
+        # Workspace partagé entre les runs d'un même pipeline : checkout + build sérialisés
+        ws_lock = _workspace_lock(pipeline.id)
+        if ws_lock.locked():
+            await _log(ctx, step, "Waiting for another run of this pipeline to release the workspace...")
+        async with ws_lock:
             ws = _workspace(pipeline.id)
-            await _log(run_id, step, f"Workspace: {ws}", pipeline.id)
-            await _log(run_id, step, f"Cloning {pipeline.github_url} ({pipeline.branch})", pipeline.id)
-            _git_checkout(pipeline.github_url, pipeline.branch, ws)
-            await _step_ok(run_id, step, pipeline.id)
+            await _log(ctx, step, f"Workspace: {ws}")
+            await _log(ctx, step, f"Cloning {pipeline.github_url} ({pipeline.branch})")
+            await _git_checkout(pipeline.github_url, pipeline.branch, ws)
+            await _step_ok(ctx, step)
 
             # STEP: tests Maven
             step = "maven_tests"
-            await _step_start(run_id, step, pipeline.id)
-            
+            await _step_start(ctx, step)
+        
             demo_dir = ws / "demo"
-            if not demo_dir.exists():
-                await _log(run_id, step, "No demo directory found, skipping tests", pipeline.id)
-                await _step_ok(run_id, step, pipeline.id)
+            # un seul stat : réutilisé pour le contexte du docker build
+            has_demo = demo_dir.exists()
+            if not has_demo:
+                await _log(ctx, step, "No demo directory found, skipping tests")
+                await _step_ok(ctx, step)
             else:
-                # Build with Maven
-                await _log(run_id, step, "Building with Maven (./mvnw -B clean compile)...", pipeline.id)
-                for line in _run_cmd(["./mvnw", "-B", "clean", "compile"], cwd=str(demo_dir)):
-                    await _log(run_id, step, line, pipeline.id)
-                
-                # Run tests
-                await _log(run_id, step, "Running tests (./mvnw -B test)...", pipeline.id)
-                for line in _run_cmd(["./mvnw", "-B", "test"], cwd=str(demo_dir)):
-                    await _log(run_id, step, line, pipeline.id)
-                
-                await _log(run_id, step, "✅ Tests passed successfully!", pipeline.id)
-                await _step_ok(run_id, step, pipeline.id)
-
-            # STEP: docker build
-            step = "docker_build"
-            await _step_start(run_id, step, pipeline.id)
-            
-            build_context = str(demo_dir) if demo_dir.exists() else str(ws)
-            await _log(run_id, step, f"Building Docker image: {image_tag}", pipeline.id)
-            await _log(run_id, step, f"Build context: {build_context}", pipeline.id)
-            
-            for line in _run_cmd(["docker", "build", "-t", image_tag, build_context]):
-                await _log(run_id, step, line, pipeline.id)
-            
-            await _log(run_id, step, "✅ Docker image built successfully!", pipeline.id)
-            await _step_ok(run_id, step, pipeline.id)
-
-            # STEP: ship image (ssh)
-            step = "ship_image_ssh"
-            await _step_start(run_id, step, pipeline.id)
-            await _log(run_id, step, f"📦 Shipping Docker image to {DEPLOY_USER}@{DEPLOY_HOST}", pipeline.id)
-            await _log(run_id, step, "This may take several minutes depending on image size...", pipeline.id)
-            
-            _docker_save_and_load_over_ssh(DEPLOY_USER, DEPLOY_HOST, DEPLOY_PORT, image_tag)
-            await _log(run_id, step, f"✅ Image {image_tag} successfully transferred!", pipeline.id)
-            await _step_ok(run_id, step, pipeline.id)
+                M2_REPO.mkdir(parents=True, exist_ok=True)
+                maven_repo = f"-Dmaven.repo.local={M2_REPO}"
 
-            # STEP: deploy run
-            step = "deploy_run"
-            await _step_start(run_id, step, pipeline.id)
-
-            rm_cmd = f"docker rm -f {container_name} 2>/dev/null || true"
-            run_cmd = f"docker run {image_tag}"
-
-            await _log(run_id, step, f"Stopping old container: {container_name}", pipeline.id)
-            for line in _ssh_exec(DEPLOY_USER, DEPLOY_HOST, DEPLOY_PORT, rm_cmd):
-                await _log(run_id, step, line, pipeline.id)
+                # Build + tests en une seule JVM Maven (la phase test inclut compile)
+                await _log(ctx, step, "Building and running tests (./mvnw -B clean test)...")
+                async for line in _run_cmd(["./mvnw", "-B", maven_repo, "clean", "test"], cwd=str(demo_dir)):
+                    await _log(ctx, step, line)
             
-            await _log(run_id, step, f"Starting new container: {container_name}", pipeline.id)
-            for line in _ssh_exec(DEPLOY_USER, DEPLOY_HOST, DEPLOY_PORT, run_cmd):
-                await _log(run_id, step, line, pipeline.id)
-
-            await _step_ok(run_id, step, pipeline.id)
+                await _log(ctx, step, "✅ Tests passed successfully!")
+                await _step_ok(ctx, step)
 
-            # STEP: healthcheck
-            step = "healthcheck"
-            await _step_start(run_id, step, pipeline.id)
-            healthcheck_url = f"http://{DEPLOY_HOST}:8080/health"
-            await _log(run_id, step, f"GET {healthcheck_url}", pipeline.id)
-            
-            ok = _healthcheck(healthcheck_url)
-            if not ok:
-                await _log(run_id, step, "⚠️ Healthcheck failed but continuing anyway", pipeline.id)
+            # STEP: docker build
+            step = "docker_build"
+            await _step_start(ctx, step)
+        
+            build_context = str(demo_dir) if has_demo else str(ws)
+            # tag adressé par le contenu (arbre git du contexte) : mêmes sources => même image
+            src_hash = await _git_tree_hash(ws, "demo" if has_demo else "")
+            src_tag = f"{image_repo}:src-{src_hash[:12]}"
+
+            if await _succeeds(["docker", "image", "inspect", src_tag]):
+                await _log(ctx, step, f"Sources unchanged, reusing image {src_tag}")
+                await _drain(["docker", "tag", src_tag, image_tag])
             else:
-                await _log(run_id, step, "✅ Healthcheck OK!", pipeline.id)
-            await _step_ok(run_id, step, pipeline.id)
-
-            # SUCCESS
-            await _emit(run_id, {"type": "run_success"}, pipeline.id)
-            await _log(run_id, "success", "🎉 Pipeline completed successfully!", pipeline.id)
-            run.status = RunStatus.success
-            run.finished_at = datetime.utcnow()
-            session.add(run)
-            session.commit()
-
-        except Exception as e:
-            # Pipeline FAILED
-            await _emit(run_id, {"type": "run_failed", "message": str(e)}, pipeline.id)
-            await _log(run_id, "error", f"❌ Pipeline FAILED: {e}", pipeline.id)
-            run.status = RunStatus.failed
-            run.finished_at = datetime.utcnow()
-            session.add(run)
-            session.commit()
+                await _log(ctx, step, f"Building Docker image: {image_tag}")
+                await _log(ctx, step, f"Build context: {build_context}")
+
+                async for line in _run_cmd(["docker", "build", "-t", image_tag, "-t", src_tag, build_context]):
+                    await _log(ctx, step, line)
+
+                await _log(ctx, step, "✅ Docker image built successfully!")
+            await _step_ok(ctx, step)
+
+        # STEP: ship image (ssh)
+        step = "ship_image_ssh"
+        await _step_start(ctx, step)
+        await _log(ctx, step, f"📦 Shipping Docker image to {DEPLOY_USER}@{DEPLOY_HOST}")
+        # image déjà présente sur la cible (mêmes sources) : simple re-tag distant, rien à transférer
+        remote_retag = f"docker image inspect {src_tag} >/dev/null 2>&1 && docker tag {src_tag} {image_tag}"
+        if await _succeeds(_ssh_cmd(DEPLOY_USER, DEPLOY_HOST, DEPLOY_PORT, remote_retag)):
+            await _log(ctx, step, f"Image {src_tag} already on {DEPLOY_HOST}, skipping transfer")
+        elif settings.deploy_registry:
+            await _log(ctx, step, f"Pushing through registry {settings.deploy_registry}")
+            async for line in _push_and_pull_over_ssh(DEPLOY_USER, DEPLOY_HOST, DEPLOY_PORT, image_tag, src_tag):
+                await _log(ctx, step, line)
+            await _log(ctx, step, f"✅ Image {image_tag} successfully transferred!")
+        else:
+            await _log(ctx, step, "This may take several minutes depending on image size...")
+            await _docker_save_and_load_over_ssh(DEPLOY_USER, DEPLOY_HOST, DEPLOY_PORT, image_tag, src_tag)
+            await _log(ctx, step, f"✅ Image {image_tag} successfully transferred!")
+        await _step_ok(ctx, step)
+
+        # STEP: deploy run
+        step = "deploy_run"
+        await _step_start(ctx, step)
+
+        deploy_script = _DEPLOY_SCRIPT.format(container_name=container_name, image_tag=image_tag)
+
+        await _log(ctx, step, f"Stopping old container: {container_name}")
+        async for line in _ssh_exec(DEPLOY_USER, DEPLOY_HOST, DEPLOY_PORT, deploy_script):
+            await _log(ctx, step, line)
+
+        await _step_ok(ctx, step)
+
+        # STEP: healthcheck
+        step = "healthcheck"
+        await _step_start(ctx, step)
+        healthcheck_url = f"http://{DEPLOY_HOST}:8080/health"
+        await _log(ctx, step, f"GET {healthcheck_url}")
+        
+        ok = await _healthcheck(healthcheck_url)
+        if not ok:
+            await _log(ctx, step, "⚠️ Healthcheck failed but continuing anyway")
+        else:
+            await _log(ctx, step, "✅ Healthcheck OK!")
+        await _step_ok(ctx, step)
+
+        # SUCCESS
+        await _emit(ctx, {"type": "run_success"})
+        await _log(ctx, "success", "🎉 Pipeline completed successfully!")
+        # log complet sur disque avant que le run soit vu comme terminé
+        ctx.log.close()
+        await _persist_run_status(run_id, RunStatus.success)
+
+    except Exception as e:
+        # Pipeline FAILED
+        await _emit(ctx, {"type": "run_failed", "message": str(e)})
+        await _log(ctx, "error", f"❌ Pipeline FAILED: {e}")
+        ctx.log.close()
+        await _persist_run_status(run_id, RunStatus.failed)
+    finally:
+        ctx.log.close()
+        await ctx.publisher.flush()
+        bus.close(run_id)
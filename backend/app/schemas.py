@@ -0,0 +1,29 @@
+from datetime import datetime
+from sqlmodel import SQLModel, Field
+from .models import Role
+
+class UserRead(SQLModel):
+    """Projection publique d'un User pour les listes (pas d'updated_at)."""
+    id: int
+    username: str
+    email: str
+    role: Role
+    created_at: datetime
+
+class CreateUserRequest(SQLModel):
+    username: str = Field(min_length=1)
+    role: Role = Role.viewer
+    email: str | None = None  # auto-généré (<username>@local) si absent
+
+class SetRoleRequest(SQLModel):
+    role: Role
+
+class PipelineRead(SQLModel):
+    """Colonnes affichées par la liste des pipelines (pas de timestamps)."""
+    id: int
+    name: str
+    repo_url: str
+    github_url: str
+    branch: str
+    status: str
+    created_by: str
@@ -0,0 +1,22 @@
+import os
+import tempfile
+
+import pytest
+
+# Base jetable et admin de bootstrap, avant le premier import de app.config
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/test.db")
+os.environ.setdefault("BOOTSTRAP_ADMIN_EMAIL", "admin@example.com")
+os.environ.setdefault("USE_REAL_RUNNER", "false")
+# HOME est toujours défini : on l'écrase pour que workspaces/m2/ssh restent hors du vrai home
+os.environ["HOME"] = _tmp
+
+from fastapi.testclient import TestClient  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    """Un seul TestClient (et un seul startup de l'app) pour toute la session de tests."""
+    with TestClient(app) as c:
+        yield c
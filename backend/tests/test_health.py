@@ -1,8 +1,4 @@
-from fastapi.testclient import TestClient
-from ..main import app
-
-def test_health():
-    c = TestClient(app)
-    r = c.get("/api/health")
+def test_health(client):
+    r = client.get("/api/health")
     assert r.status_code == 200
     assert r.json()["status"] == "UP"
@@ -0,0 +1,16 @@
+from app.pipelines.routes import _tail_bytes
+
+def test_tail_returns_last_lines(tmp_path):
+    log = tmp_path / "run.log"
+    log.write_bytes(b"".join(f"line {i}\n".encode() for i in range(1000)))
+
+    assert _tail_bytes(log, 3) == b"line 997\nline 998\nline 999\n"
+    # blocs plus petits qu'une ligne : la lecture à rebours doit recoller les morceaux
+    assert _tail_bytes(log, 2, block=4) == b"line 998\nline 999\n"
+
+def test_tail_short_file(tmp_path):
+    log = tmp_path / "run.log"
+    log.write_bytes(b"a\nb")
+
+    assert _tail_bytes(log, 10) == b"a\nb"
+    assert _tail_bytes(log, 1) == b"b"
@@ -0,0 +1,15 @@
+from app.models import pipeline_slug
+
+def test_slug_is_a_valid_docker_name():
+    assert pipeline_slug("My App") == "my-app"
+    assert pipeline_slug("my_app") == "my-app"
+    # séparateurs consécutifs fusionnés, rien en bord
+    assert pipeline_slug("P a_b..c") == "p-a-b-c"
+    assert pipeline_slug("$(rm -rf x)") == "rm-rf-x"
+
+def test_slug_length_bounds():
+    # tronqué à 100 puis nettoyé : ne finit jamais par un séparateur
+    assert pipeline_slug("x" * 99 + " y") == "x" * 99
+    # nom de conteneur Docker : 2 caractères minimum
+    assert pipeline_slug("A") == "pipeline-a"
+    assert pipeline_slug("!!!") == "pipeline"
@@ -1,14 +1,11 @@
-from fastapi.testclient import TestClient
-from app.main import app
-
 def h(email: str, user: str | None = None):
     headers = {"X-Auth-Request-Email": email}
     if user:
         headers["X-Auth-Request-User"] = user
     return headers
 
-def test_bootstrap_admin_can_create_pipeline():
-    c = TestClient(app)
+def test_bootstrap_admin_can_create_pipeline(client):
+    c = client
 
     # admin@example.com doit matcher BOOTSTRAP_ADMIN_EMAIL dans .env.example
     r = c.post(
@@ -16,11 +13,11 @@ def test_bootstrap_admin_can_create_pipeline():
         json={"name": "p1", "repo_url": "https://example.com/repo.git", "branch": "main"},
         headers=h("admin@example.com", "admin"),
     )
-    assert r.status_code == 200
+    assert r.status_code == 201
     assert r.json()["name"] == "p1"
 
-def test_viewer_cannot_create_or_run_pipeline():
-    c = TestClient(app)
+def test_viewer_cannot_create_or_run_pipeline(client):
+    c = client
 
     # viewer calls create -> forbidden
     r = c.post(
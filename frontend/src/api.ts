@@ -17,12 +17,18 @@ export async function api<T>(path: string, opts: RequestInit = {}): Promise<T> {
   return (txt ? JSON.parse(txt) : null) as T;
 }
 
+// Taille de page des listes (le backend plafonne limit à 500)
+export const PAGE_SIZE = 50;
+export const MAX_PAGE_SIZE = 500;
+
 export const authAPI = {
   getCurrentUser: () => api<User>("/api/me"),
 };
 
 export const userAPI = {
-  getAllUsers: () => api<User[]>("/api/admin/users"),
+  // plus récents d'abord ; page suivante : offset = nombre d'utilisateurs déjà chargés
+  getUsers: (offset = 0, limit = PAGE_SIZE) =>
+    api<User[]>(`/api/admin/users?limit=${limit}&offset=${offset}`),
 
   createUser: (username: string, role: string, email?: string) =>
     api<User>("/api/admin/users", {
@@ -38,7 +44,9 @@ export const userAPI = {
 };
 
 export const pipelineAPI = {
-  getAllPipelines: () => api<Pipeline[]>("/api/pipelines"),
+  // plus récents d'abord ; page suivante : beforeId = id du dernier pipeline chargé
+  getPipelines: (beforeId?: number, limit = PAGE_SIZE) =>
+    api<Pipeline[]>(`/api/pipelines?limit=${limit}${beforeId ? `&before_id=${beforeId}` : ""}`),
 
   createPipeline: (name: string, githubUrl: string, branch = "main") =>
     api<Pipeline>("/api/pipelines", {
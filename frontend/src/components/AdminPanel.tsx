@@ -1,9 +1,10 @@
 import { useEffect, useState } from "react";
 import type { User } from "../types";
-import { userAPI } from "../api";
+import { userAPI, PAGE_SIZE, MAX_PAGE_SIZE } from "../api";
 
 export default function AdminPanel() {
   const [users, setUsers] = useState<User[]>([]);
+  const [hasMoreUsers, setHasMoreUsers] = useState(false);
   const [loading, setLoading] = useState(false);
   const [activeTab, setActiveTab] = useState<"users" | "create">("users");
 
@@ -23,10 +24,23 @@ export default function AdminPanel() {
     loadUsers();
   }, []);
 
+  // Recharge depuis le début en gardant au moins autant de lignes que déjà affichées
   const loadUsers = async () => {
     try {
-      const data = await userAPI.getAllUsers();
+      const limit = Math.min(Math.max(users.length, PAGE_SIZE), MAX_PAGE_SIZE);
+      const data = await userAPI.getUsers(0, limit);
       setUsers(data);
+      setHasMoreUsers(data.length === limit);
+    } catch (e: any) {
+      console.error("Error loading users:", e);
+    }
+  };
+
+  const loadMoreUsers = async () => {
+    try {
+      const data = await userAPI.getUsers(users.length);
+      setUsers((prev) => [...prev, ...data]);
+      setHasMoreUsers(data.length === PAGE_SIZE);
     } catch (e: any) {
       console.error("Error loading users:", e);
     }
@@ -229,6 +243,16 @@ export default function AdminPanel() {
                 ))}
               </tbody>
             </table>
+            {hasMoreUsers && (
+              <div className="mt-4 text-center">
+                <button
+                  onClick={loadMoreUsers}
+                  className="bg-gray-100 hover:bg-gray-200 text-gray-800 text-sm font-medium py-2 px-4 rounded-lg"
+                >
+                  Charger plus
+                </button>
+              </div>
+            )}
           </div>
         </>
       )}
@@ -25,8 +25,7 @@ export default function AuthGuard({ children, onForbidden }: AuthGuardProps) {
           email: "admin@test.com", 
           username: "admin_test", 
           role: "admin",
-          created_at: new Date().toISOString(),
-          updated_at: new Date().toISOString()
+          created_at: new Date().toISOString()
         });
         setLoading(false);
         return;
@@ -1,7 +1,7 @@
 import { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
 import type { User, Pipeline } from "../types";
-import { pipelineAPI } from "../api";
+import { pipelineAPI, PAGE_SIZE, MAX_PAGE_SIZE } from "../api";
 import AdminPanel from "../components/AdminPanel";
 
 interface DashboardProps {
@@ -14,6 +14,7 @@ export default function Dashboard({ user }: DashboardProps) {
   const [pipelineName, setPipelineName] = useState("");
   const [branch, setBranch] = useState("main");
   const [pipelines, setPipelines] = useState<Pipeline[]>([]);
+  const [hasMorePipelines, setHasMorePipelines] = useState(false);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [success, setSuccess] = useState<string | null>(null);
@@ -26,10 +27,25 @@ export default function Dashboard({ user }: DashboardProps) {
     loadPipelines();
   }, []);
 
+  // Recharge depuis le début en gardant au moins autant de lignes que déjà affichées
   const loadPipelines = async () => {
     try {
-      const data = await pipelineAPI.getAllPipelines();
+      const limit = Math.min(Math.max(pipelines.length, PAGE_SIZE), MAX_PAGE_SIZE);
+      const data = await pipelineAPI.getPipelines(undefined, limit);
       setPipelines(data);
+      setHasMorePipelines(data.length === limit);
+    } catch (err) {
+      console.error("Error loading pipelines:", err);
+    }
+  };
+
+  const loadMorePipelines = async () => {
+    const last = pipelines[pipelines.length - 1];
+    if (!last) return;
+    try {
+      const data = await pipelineAPI.getPipelines(last.id);
+      setPipelines((prev) => [...prev, ...data]);
+      setHasMorePipelines(data.length === PAGE_SIZE);
     } catch (err) {
       console.error("Error loading pipelines:", err);
     }
@@ -238,6 +254,16 @@ export default function Dashboard({ user }: DashboardProps) {
                   ))}
                 </tbody>
               </table>
+              {hasMorePipelines && (
+                <div className="mt-4 text-center">
+                  <button
+                    onClick={loadMorePipelines}
+                    className="bg-gray-100 hover:bg-gray-200 text-gray-800 text-sm font-medium py-2 px-4 rounded-lg"
+                  >
+                    Charger plus
+                  </button>
+                </div>
+              )}
             </div>
           )}
         </div>
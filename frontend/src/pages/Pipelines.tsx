@@ -1,11 +1,12 @@
 import { useEffect, useState } from "react";
-import { api } from "../api";
+import { api, PAGE_SIZE } from "../api";
 
 type Pipeline = { id: number; name: string; repo_url: string; branch: string };
 type Me = { id: number; email: string; username: string; role: string };
 
 export default function Pipelines() {
   const [pipelines, setPipelines] = useState<Pipeline[]>([]);
+  const [hasMore, setHasMore] = useState(false);
   const [me, setMe] = useState<Me | null>(null);
   const [name, setName] = useState("Demo pipeline");
   const [repoUrl, setRepoUrl] = useState("https://github.com/ORG/REPO.git");
@@ -17,8 +18,22 @@ export default function Pipelines() {
     try {
       const meData = await api<Me>("/api/me");
       setMe(meData);
-      const data = await api<Pipeline[]>("/api/pipelines");
+      const data = await api<Pipeline[]>(`/api/pipelines?limit=${PAGE_SIZE}`);
       setPipelines(data);
+      setHasMore(data.length === PAGE_SIZE);
+    } catch (e: any) {
+      setErr(e.message || String(e));
+    }
+  }
+
+  async function loadMore() {
+    const last = pipelines[pipelines.length - 1];
+    if (!last) return;
+    setErr(null);
+    try {
+      const data = await api<Pipeline[]>(`/api/pipelines?limit=${PAGE_SIZE}&before_id=${last.id}`);
+      setPipelines((prev) => [...prev, ...data]);
+      setHasMore(data.length === PAGE_SIZE);
     } catch (e: any) {
       setErr(e.message || String(e));
     }
@@ -72,6 +87,7 @@ export default function Pipelines() {
           </li>
         ))}
       </ul>
+      {hasMore && <button onClick={loadMore}>Load more</button>}
     </div>
   );
 }
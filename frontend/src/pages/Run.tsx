@@ -8,10 +8,16 @@ function formatEvent(e: RunEvent): string {
     const step = e.step ? `[${e.step}] ` : "";
     return `${step}${e.message ?? ""}\n`;
   }
+  if (e.type === "log_batch") {
+    const step = e.step ? `[${e.step}] ` : "";
+    return (e.lines ?? []).map((l) => `${step}${l}\n`).join("");
+  }
   if (e.type === "step_start") return `\n▶️ START ${e.step}\n`;
   if (e.type === "step_success") return `✅ OK ${e.step}\n`;
   if (e.type === "run_start") return `\n🚀 RUN START\n`;
   if (e.type === "run_success") return `\n🎉 RUN SUCCESS\n`;
+  if (e.type === "dropped") return `⚠️ ${e.count ?? 0} events dropped (client too slow)\n`;
+  if (e.type === "stream_reset") return `⚠️ Live stream no longer available, see the detailed logs\n`;
   if (e.type === "run_failed") return `\n❌ RUN FAILED: ${e.message ?? ""}\n`;
   return `${JSON.stringify(e)}\n`;
 }
@@ -47,6 +53,10 @@ export default function Run({ runId }: { runId: string }) {
         try {
           const evt = JSON.parse(e.data) as RunEvent;
           setOut((p) => p + formatEvent(evt));
+          // run terminé ou flux disparu : rien d'autre ne viendra, pas de reconnexion auto
+          if (evt.type === "run_success" || evt.type === "run_failed" || evt.type === "stream_reset") {
+            es?.close();
+          }
         } catch {
           setOut((p) => p + e.data + "\n");
         }
@@ -6,7 +6,6 @@ export interface User {
   username: string;
   role: Role;
   created_at: string;
-  updated_at: string;
 }
 
 export interface Pipeline {
@@ -17,12 +16,12 @@ export interface Pipeline {
   branch: string;
   status: string;
   created_by: string;
-  created_at: string;
-  updated_at: string;
 }
 
 export interface RunEvent {
-  type: "log" | "step_start" | "step_success" | "run_start" | "run_success" | "run_failed";
+  type: "log" | "log_batch" | "step_start" | "step_success" | "run_start" | "run_success" | "run_failed" | "dropped" | "stream_reset";
   step?: string;
   message?: string;
+  lines?: string[];  // log_batch : plusieurs lignes de log regroupées
+  count?: number;    // dropped : événements perdus (client trop lent)
 }